@@ -0,0 +1,202 @@
+"""
+Shared helpers for the chunking scripts
+=======================================
+
+Tokenizer loading (and sharing it with worker processes), worker pool sizing
+and result reporting used by both hybrid_chunking.py and
+hybrid_chunking_lightweight.py.
+
+This module deliberately does not import Docling, so the lightweight script
+keeps its low memory footprint. Scripts should set TOKENIZERS_PARALLELISM and
+their thread-count environment variables before importing it.
+"""
+
+import os
+from tokenizers import Tokenizer
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
+from pathlib import Path
+import multiprocessing as mp
+import sys
+
+# Embedding model whose tokenizer both scripts count tokens with
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Per-process tokenizer, created lazily on first use (or by install_tokenizer)
+_tokenizer = None
+
+
+def _warm_up(tokenizer):
+    """Spin up the tokenizer thread pool before the batch loop."""
+    tokenizer(["warmup"] * 8)
+    return tokenizer
+
+
+def load_tokenizer():
+    """Load the fast (Rust) tokenizer and warm up its thread pool."""
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True)
+    assert tokenizer.is_fast, "Fast (Rust) tokenizer backend is required"
+    return _warm_up(tokenizer)
+
+
+def tokenizer_to_state(tokenizer):
+    """Serialize a fast tokenizer so worker processes can rebuild it cheaply.
+
+    Rebuilding from the tokenizer.json string avoids every worker hitting the
+    Hugging Face cache (and its file locks) or the network.
+    """
+    return (tokenizer.backend_tokenizer.to_str(), tokenizer.model_max_length,
+            dict(tokenizer.special_tokens_map))
+
+
+def tokenizer_from_state(state):
+    """Rebuild a fast tokenizer from tokenizer_to_state() output and warm it up."""
+    tokenizer_json, model_max_length, special_tokens = state
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=Tokenizer.from_str(tokenizer_json),
+        model_max_length=model_max_length,
+        **special_tokens
+    )
+    return _warm_up(tokenizer)
+
+
+def install_tokenizer(tokenizer_state):
+    """Make a copy of the parent's tokenizer this process's tokenizer (worker initializers)."""
+    global _tokenizer
+    _tokenizer = tokenizer_from_state(tokenizer_state)
+
+
+def get_tokenizer():
+    """Return this process's tokenizer, loading it on first use (unless install_tokenizer ran)."""
+    global _tokenizer
+
+    if _tokenizer is None:
+        print(f"\n[*] Initializing tokenizer (pid {os.getpid()})...")
+        _tokenizer = load_tokenizer()
+        print("[OK] Tokenizer initialized")
+
+    return _tokenizer
+
+
+def largest_first(paths: list) -> list:
+    """Order files by size, largest first.
+
+    A big document then doesn't start last and leave the other workers idle
+    while it finishes.
+    """
+    return sorted(paths, key=os.path.getsize, reverse=True)
+
+
+def memory_limit_gb(cpus: int):
+    """Memory limit set by SLURM or the cgroup in GB (None if unlimited or unknown)."""
+    limits = []
+
+    try:
+        if os.environ.get("SLURM_MEM_PER_NODE"):
+            limits.append(int(os.environ["SLURM_MEM_PER_NODE"]) / 1024)  # Reported in MB
+        elif os.environ.get("SLURM_MEM_PER_CPU"):
+            limits.append(int(os.environ["SLURM_MEM_PER_CPU"]) * cpus / 1024)
+    except ValueError:
+        pass
+
+    # This process's cgroup (SLURM puts each job in its own), v2 then v1;
+    # v1 reports a huge number when unlimited, which min() absorbs
+    candidates = []
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            _, controllers, cgroup = line.split(":", 2)
+            if controllers == "":
+                candidates.append(f"/sys/fs/cgroup{cgroup}/memory.max")
+            elif "memory" in controllers.split(","):
+                candidates.append(f"/sys/fs/cgroup/memory{cgroup}/memory.limit_in_bytes")
+    except (OSError, ValueError):
+        pass
+    candidates += ["/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"]
+
+    for path in candidates:
+        try:
+            value = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if value.isdigit():
+            limits.append(int(value) / (1024 ** 3))
+        break
+
+    return min(limits) if limits else None
+
+
+def available_memory_gb(cpus: int):
+    """Best-effort memory available to this job in GB (None if it cannot be determined)."""
+    candidates = []
+    try:
+        # MemAvailable counts reclaimable page cache, unlike MemFree (SC_AVPHYS_PAGES)
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                candidates.append(int(line.split()[1]) / (1024 ** 2))  # Reported in kB
+                break
+    except (OSError, ValueError, IndexError):
+        pass
+    if not candidates:
+        try:
+            candidates.append(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES") / (1024 ** 3))
+        except (AttributeError, ValueError, OSError):
+            pass
+
+    limit_gb = memory_limit_gb(cpus)
+    if limit_gb is not None:
+        candidates.append(limit_gb)
+
+    return min(candidates) if candidates else None
+
+
+def cpu_count() -> int:
+    """CPUs available to this process (respects SLURM/cgroup CPU allocation)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(env_var: str, default: int) -> int:
+    """Threads each worker runs, as configured by env_var."""
+    try:
+        return max(int(os.environ.get(env_var, default)), 1)
+    except ValueError:
+        return default
+
+
+def worker_count(num_files: int, worker_memory_gb: float, parent_memory_gb: float,
+                 worker_threads: int) -> int:
+    """Pick a process count bounded by CPUs, files and available RAM.
+
+    CPUs are divided by the threads each worker runs to avoid oversubscription;
+    parent_memory_gb is kept back for the parent.
+    """
+    cpus = cpu_count()
+    workers = min(max(cpus // worker_threads, 1), num_files)
+
+    memory_gb = available_memory_gb(cpus)
+    if memory_gb is not None:
+        workers = min(workers, max(int((memory_gb - parent_memory_gb) // worker_memory_gb), 1))
+
+    return workers
+
+
+def mp_context():
+    """forkserver on Linux avoids forking a parent with torch/tokenizer threads running."""
+    return mp.get_context("forkserver") if sys.platform.startswith("linux") else mp.get_context()
+
+
+def print_results(results):
+    """Print each document's report as its (file_path, error, report) result arrives.
+
+    Returns:
+        Tuple of (processed count, failed count)
+    """
+    processed_count = failed_count = 0
+    for _, error, report in results:
+        print(report, end="", flush=True)
+        if error is None:
+            processed_count += 1
+        else:
+            failed_count += 1
+    return processed_count, failed_count
@@ -8,9 +8,10 @@ token limits.
 
 CONFIGURATION: HPC-Optimized (Full Features Enabled)
 - Table extraction: ENABLED (TableFormer model)
-- OCR: ENABLED (for scanned documents)
-- High-resolution image processing: ENABLED (2.0x scale)
-- Page/picture image generation: ENABLED
+- OCR: ENABLED (for scanned documents; --no-ocr for born-digital corpora).
+  Docling's default EasyOCR engine; --ocr-engine rapidocr opts in to RapidOCR
+- Page/picture image generation: DISABLED (nothing downstream consumes the
+  images; opt in with --with-images, which also renders at 2.0x scale)
 
 What is Hybrid Chunking?
 - Combines hierarchical document structure with token-aware splitting
@@ -27,30 +28,159 @@ Why use it?
 - Handles scanned PDFs via OCR
 
 Usage:
-    python hybrid_chunking.py
+    python hybrid_chunking.py [--with-images] [--no-ocr] [--ocr-engine {easyocr,rapidocr}]
 
 Requirements:
     - Recommended: 8GB+ RAM for full feature set
     - HPC environment recommended for batch processing
 """
 
+import os
+
+# Let the Rust tokenizer use its thread pool for batched calls (must be set
+# before transformers/tokenizers are imported)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+# Docling runs 4 intra-op threads per converter by default; pin OpenMP to the
+# same figure so the worker count derived from it matches what workers use
+os.environ.setdefault("OMP_NUM_THREADS", "4")
+
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.datamodel.settings import settings
 from docling.chunking import HybridChunker
+from docling_core.types.doc import DoclingDocument
 from transformers import AutoTokenizer
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from importlib.metadata import version
+from importlib.util import find_spec
+from itertools import repeat
 from pathlib import Path
-import os
+import numpy as np
+import argparse
+import hashlib
+import io
 import glob
+import sys
+import traceback
+
+from chunking_utils import (get_tokenizer, install_tokenizer, largest_first, mp_context,
+                            print_results, threads_per_worker, tokenizer_to_state, worker_count)
+
+try:
+    from blake3 import blake3
+except ImportError:  # Optional: hashlib's blake2b is used instead
+    blake3 = None
+
+try:
+    from docling.datamodel.pipeline_options import RapidOcrOptions
+except ImportError:  # Older Docling: only the default (EasyOCR) engine
+    RapidOcrOptions = None
+
+try:
+    from docling.datamodel.accelerator_options import AcceleratorDevice, AcceleratorOptions
+except ImportError:
+    try:  # Location in earlier Docling 2.x releases
+        from docling.datamodel.pipeline_options import AcceleratorDevice, AcceleratorOptions
+    except ImportError:  # Docling without accelerator options: models run on CPU
+        AcceleratorDevice = AcceleratorOptions = None
+
+# Approximate peak RAM of one Docling worker (TableFormer + OCR models loaded)
+WORKER_MEMORY_GB = 8
+
+# RAM kept back for the parent process (tokenizer, result bookkeeping)
+PARENT_MEMORY_GB = 2
+
+# Chunks buffered per batched token-count call while streaming to disk
+TOKEN_COUNT_BATCH_SIZE = 64
+
+# Pages Docling pushes through its models per batch when running on a GPU
+GPU_PAGE_BATCH_SIZE = 16
+
+# Token distribution bucket edges: [0, 128), [128, 256), [256, 384), [384, 512)
+TOKEN_BUCKET_EDGES = np.array([0, 128, 256, 384, 512])
+
+# Separator line around chunk headers in output files
+CHUNK_SEPARATOR = "=" * 60 + "\n"
+
+# Write buffer for chunk output files (fewer flushes for large documents)
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Converted DoclingDocuments, keyed by file content + pipeline configuration.
+# Kept under outputs/ by default since that is writable inside the container;
+# override with DOCLING_CACHE_DIR.
+CACHE_DIR = Path(os.environ.get("DOCLING_CACHE_DIR", "outputs/.docling_cache"))
+
+# Per-process shared resources, created lazily on first use in each worker
+_converter = None
+_pipeline_options = None
+
+def document_cache_key(file_path: str, pipeline_options) -> str:
+    """Hash file contents, pipeline options and Docling version into a cache key."""
+    hasher = blake3() if blake3 is not None else hashlib.blake2b(digest_size=16)
+
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+
+    # Option or Docling upgrades must not reuse stale conversions (the device
+    # the models ran on does not change the result)
+    options_json = pipeline_options.model_dump_json(exclude={"accelerator_options"})
+    hasher.update(options_json.encode('utf-8'))
+    hasher.update(version("docling").encode('utf-8'))
+
+    return hasher.hexdigest()[:32]
+
+def convert_document(file_path: str, converter, pipeline_options=None, cache_dir: Path = CACHE_DIR):
+    """Convert a document, reusing a cached conversion of identical input.
+
+    Caching is skipped when pipeline_options is None, since the key would not
+    reflect how the converter is configured.
+    """
+    if pipeline_options is None:
+        return converter.convert(file_path).document
+
+    cache_path = cache_dir / f"{document_cache_key(file_path, pipeline_options)}.json"
+
+    if cache_path.exists():
+        try:
+            doc = DoclingDocument.load_from_json(cache_path)
+            print(f"   (loaded cached conversion: {cache_path})")
+            return doc
+        except Exception as e:
+            print(f"   [WARN] Ignoring unreadable cache entry {cache_path}: {e}")
 
-def chunk_document(file_path: str, max_tokens: int = 512, converter=None, tokenizer=None):
+    doc = converter.convert(file_path).document
+
+    # Write to a temporary file first so concurrent workers never read a partial entry.
+    # Caching is best-effort: an unwritable cache must not fail the document.
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        doc.save_as_json(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"   [WARN] Could not write cache entry {cache_path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+    return doc
+
+def chunk_document(file_path: str, max_tokens: int = 512, converter=None, tokenizer=None,
+                   pipeline_options=None):
     """Convert and chunk document using HybridChunker.
 
+    Returns a (chunk iterator, chunker) pair. HybridChunker materializes all
+    chunks up front, so the iterator only saves callers from keeping a copy.
+
     Args:
         file_path: Path to document to process
         max_tokens: Maximum tokens per chunk
         converter: Reusable DocumentConverter instance (prevents memory exhaustion)
         tokenizer: Reusable AutoTokenizer instance (prevents memory exhaustion)
+        pipeline_options: Options the converter was built with; enables the
+            on-disk conversion cache when given
     """
 
     print(f"\n[*] Processing: {Path(file_path).name}")
@@ -59,14 +189,13 @@ def chunk_document(file_path: str, max_tokens: int = 512, converter=None, tokeni
     print("   Step 1: Converting document...")
     if converter is None:
         converter = DocumentConverter()
-    result = converter.convert(file_path)
-    doc = result.document
+    doc = convert_document(file_path, converter, pipeline_options)
 
     # Step 2: Initialize tokenizer (using sentence-transformers model)
     if tokenizer is None:
         print("   Step 2: Initializing tokenizer...")
         model_id = "sentence-transformers/all-MiniLM-L6-v2"
-        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        tokenizer = AutoTokenizer.from_pretrained(model_id, use_fast=True)
     else:
         print("   Step 2: Using shared tokenizer...")
 
@@ -78,85 +207,271 @@ def chunk_document(file_path: str, max_tokens: int = 512, converter=None, tokeni
         merge_peers=True  # Merge small adjacent chunks
     )
 
-    # Step 4: Generate chunks
+    # Step 4: Generate chunks (consumers iterate them once rather than
+    # keeping their own list)
     print("   Step 4: Generating chunks...")
     chunk_iter = chunker.chunk(dl_doc=doc)
-    chunks = list(chunk_iter)
 
-    return chunks, chunker
+    return chunk_iter, chunker
 
-def analyze_chunks(chunks, tokenizer):
-    """Analyze and display chunk statistics."""
+def count_tokens(texts, tokenizer):
+    """Token count (including special tokens) of each text, in one batched call."""
+    if not texts:
+        return []
+    return list(tokenizer(texts, add_special_tokens=True, return_length=True)['length'])
+
+def print_chunk_statistics(preview_chunks, chunk_sizes):
+    """Display preview chunks and summary statistics for a document.
+
+    Args:
+        preview_chunks: First few chunks to show in detail
+        chunk_sizes: Token count of every chunk, in document order
+    """
 
     print("\n" + "=" * 60)
     print("CHUNK ANALYSIS")
     print("=" * 60)
 
-    total_tokens = 0
-    chunk_sizes = []
-
-    for i, chunk in enumerate(chunks):
+    for i, (chunk, token_count) in enumerate(zip(preview_chunks, chunk_sizes)):
         # Get text content
         text = chunk.text
-        tokens = tokenizer.encode(text)
-        token_count = len(tokens)
 
-        total_tokens += token_count
-        chunk_sizes.append(token_count)
+        print(f"\n--- Chunk {i} ---")
+        print(f"Tokens: {token_count}")
+        print(f"Characters: {len(text)}")
+        print(f"Preview: {text[:150]}...")
 
-        # Display first 3 chunks in detail
-        if i < 3:
-            print(f"\n--- Chunk {i} ---")
-            print(f"Tokens: {token_count}")
-            print(f"Characters: {len(text)}")
-            print(f"Preview: {text[:150]}...")
+        # Show metadata if available
+        if hasattr(chunk, 'meta') and chunk.meta:
+            print(f"Metadata: {chunk.meta}")
 
-            # Show metadata if available
-            if hasattr(chunk, 'meta') and chunk.meta:
-                print(f"Metadata: {chunk.meta}")
+    sizes = np.asarray(chunk_sizes, dtype=np.int64)
+    total_tokens = int(sizes.sum())
 
     # Summary statistics
     print("\n" + "=" * 60)
     print("SUMMARY STATISTICS")
     print("=" * 60)
-    print(f"Total chunks: {len(chunks)}")
+    print(f"Total chunks: {sizes.size}")
     print(f"Total tokens: {total_tokens}")
-    print(f"Average tokens per chunk: {total_tokens / len(chunks):.1f}")
-    print(f"Min tokens: {min(chunk_sizes)}")
-    print(f"Max tokens: {max(chunk_sizes)}")
-
-    # Token distribution
-    print(f"\nToken distribution:")
-    ranges = [(0, 128), (128, 256), (256, 384), (384, 512)]
-    for start, end in ranges:
-        count = sum(1 for size in chunk_sizes if start <= size < end)
-        print(f"  {start}-{end} tokens: {count} chunks")
+    if sizes.size > 0:
+        print(f"Average tokens per chunk: {total_tokens / sizes.size:.1f}")
+        print(f"Min tokens: {sizes.min()}")
+        print(f"Max tokens: {sizes.max()}")
+
+        # Token distribution (digitize keeps buckets half-open, like start <= size < end)
+        print(f"\nToken distribution:")
+        edges = TOKEN_BUCKET_EDGES
+        counts = np.bincount(np.digitize(sizes, edges), minlength=len(edges) + 1)[1:len(edges)]
+        for start, end, count in zip(edges[:-1], edges[1:], counts):
+            print(f"  {start}-{end} tokens: {count} chunks")
+
+def stream_chunks_to_file(chunk_iter, chunker, tokenizer, output_path: str, preview_count: int = 3):
+    """Write chunks to file in a single pass, collecting statistics on the way.
+
+    Only token counts and the first few chunks are kept here, so this avoids
+    holding a second list of the chunks. HybridChunker itself still builds
+    the full chunk list before returning its iterator, so peak RAM does grow
+    with the number of chunks in the document.
 
-def save_chunks(chunks, chunker, output_path: str):
-    """Save chunks to file with separators, preserving context and headings."""
+    Args:
+        chunk_iter: Iterator of chunks (from chunk_document)
+        chunker: HybridChunker used to contextualize each chunk
+        tokenizer: Tokenizer used for per-chunk token counts
+        output_path: Destination text file
+        preview_count: Number of leading chunks to keep for the analysis preview
+
+    Returns:
+        Tuple of (token count per chunk, preview chunks)
+    """
 
     # Create output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for i, chunk in enumerate(chunks):
-            f.write(f"{'='*60}\n")
-            f.write(f"CHUNK {i}\n")
-            f.write(f"{'='*60}\n")
+    chunk_sizes = []
+    preview_chunks = []
+    pending_texts = []  # Chunk texts awaiting a batched token count
 
+    with open(output_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        for i, chunk in enumerate(chunk_iter):
             # Use contextualize to preserve headings and metadata
             contextualized_text = chunker.contextualize(chunk=chunk)
-            f.write(contextualized_text)
-            f.write("\n\n")
+            f.write(f"{CHUNK_SEPARATOR}CHUNK {i}\n{CHUNK_SEPARATOR}{contextualized_text}\n\n")
+
+            pending_texts.append(chunk.text)
+            if len(pending_texts) == TOKEN_COUNT_BATCH_SIZE:
+                chunk_sizes.extend(count_tokens(pending_texts, tokenizer))
+                pending_texts = []
+
+            if i < preview_count:
+                preview_chunks.append(chunk)
+
+    chunk_sizes.extend(count_tokens(pending_texts, tokenizer))
 
     print(f"\n[OK] Chunks saved to: {output_path}")
     print("   (with preserved headings and document context)")
 
+    return chunk_sizes, preview_chunks
+
+def cuda_device_count() -> int:
+    """Number of CUDA devices PyTorch (installed with Docling) can see."""
+    if AcceleratorOptions is None:  # Docling cannot place models on the GPU
+        return 0
+    try:
+        import torch
+    except ImportError:
+        return 0
+    return torch.cuda.device_count() if torch.cuda.is_available() else 0
+
+def _rapidocr_available() -> bool:
+    """Whether Docling's RapidOCR engine (ONNX Runtime backend) is installed."""
+    if RapidOcrOptions is None or find_spec("onnxruntime") is None:
+        return False
+    return find_spec("rapidocr") is not None or find_spec("rapidocr_onnxruntime") is not None
+
+def analyze_and_save(chunks, chunker, tokenizer, output_path: str):
+    """Save chunks and display their statistics.
+
+    Writing, token counting and preview collection share a single pass over
+    the chunks (see stream_chunks_to_file), so chunks may be any iterable,
+    such as the iterator returned by chunk_document.
+    """
+    chunk_sizes, preview_chunks = stream_chunks_to_file(chunks, chunker, tokenizer, output_path)
+    print_chunk_statistics(preview_chunks, chunk_sizes)
+
+def create_pipeline_options(with_images: bool = False, do_ocr: bool = True, use_cuda: bool = False,
+                            ocr_engine: str = "easyocr"):
+    """Create PDF pipeline options for the full-featured HPC configuration.
+
+    Args:
+        with_images: Generate page and picture images (at 2.0x scale). Chunking
+            never uses them, so they are off unless something downstream needs them
+        do_ocr: Run OCR on every page; disable for born-digital PDFs
+        use_cuda: Run the models on the (first visible) GPU; decided once in
+            main() so each worker process is pinned to its own device
+        ocr_engine: "easyocr" (Docling's default) or "rapidocr". RapidOCR uses
+            different models and language defaults, so its OCR output differs
+    """
+
+    # Configure PDF pipeline with MAXIMUM quality options for HPC
+    pipeline_options = PdfPipelineOptions()
+    pipeline_options.do_table_structure = True   # Enable TableFormer for table extraction
+    pipeline_options.do_ocr = do_ocr            # Enable OCR for scanned documents
+    pipeline_options.images_scale = 2.0 if with_images else 1.0  # Resolution of generated images
+    pipeline_options.generate_page_images = with_images  # Generate page images for analysis
+    pipeline_options.generate_picture_images = with_images  # Extract embedded images
+
+    if use_cuda and AcceleratorOptions is not None:
+        # Run layout, TableFormer and OCR models on the GPU; larger page
+        # batches keep it busy (CPU threads still follow OMP_NUM_THREADS)
+        pipeline_options.accelerator_options = AcceleratorOptions(device=AcceleratorDevice.CUDA)
+        settings.perf.page_batch_size = max(settings.perf.page_batch_size, GPU_PAGE_BATCH_SIZE)
+
+    if ocr_engine == "rapidocr":
+        # Opt-in alternative engine: PP-OCR models run through ONNX Runtime
+        pipeline_options.ocr_options = RapidOcrOptions()
+
+    return pipeline_options
+
+def create_converter(pipeline_options=None):
+    """Create a DocumentConverter with the full-featured HPC pipeline."""
+
+    if pipeline_options is None:
+        pipeline_options = create_pipeline_options()
+
+    # Create converter with FULL-FEATURED options for HPC
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
+        }
+    )
+
+def _init_worker(tokenizer_state, gpu_queue=None):
+    """Process pool initializer: install this worker's copy of the parent's tokenizer.
+
+    With gpu_queue, the worker also claims one GPU index and restricts itself to
+    it, so workers do not all load their models onto the same device.
+    """
+    if gpu_queue is not None:
+        # Index into any devices SLURM already exposed; must happen before the
+        # first CUDA call in this process
+        device_index = gpu_queue.get()
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        devices = visible.split(",") if visible else [str(i) for i in range(device_index + 1)]
+        os.environ["CUDA_VISIBLE_DEVICES"] = devices[device_index]
+    install_tokenizer(tokenizer_state)
+
+def _get_shared_resources(with_images: bool = False, do_ocr: bool = True, use_cuda: bool = False,
+                          ocr_engine: str = "easyocr"):
+    """Return this process's converter, tokenizer and pipeline options, creating them on first use."""
+    global _converter, _pipeline_options
+
+    if _converter is None:
+        print(f"\n[*] Initializing shared converter (pid {os.getpid()})...")
+        _pipeline_options = create_pipeline_options(with_images, do_ocr, use_cuda, ocr_engine)
+        _converter = create_converter(_pipeline_options)
+        print("[OK] Shared converter initialized")
+
+    return _converter, get_tokenizer(), _pipeline_options
+
+def _process_one(file_path: str, max_tokens: int = 512, with_images: bool = False, do_ocr: bool = True,
+                 use_cuda: bool = False, ocr_engine: str = "easyocr"):
+    """Chunk, analyze and save a single document.
+
+    Runs inside a worker process, so errors are reported here and returned
+    rather than raised. The document's printed report is captured and
+    returned too, so the parent can print it without concurrent workers'
+    output interleaving.
+
+    Returns:
+        Tuple of (file_path, error message or None on success, report text)
+    """
+    file_name = Path(file_path).stem  # Get filename without extension
+    report = io.StringIO()
+
+    with redirect_stdout(report):
+        print("\n" + "=" * 60)
+        print(f"Processing: {Path(file_path).name}")
+        print("=" * 60)
+
+        try:
+            converter, tokenizer, pipeline_options = _get_shared_resources(with_images, do_ocr, use_cuda,
+                                                                           ocr_engine)
+
+            # Generate chunks (using shared converter and tokenizer, and the conversion cache)
+            chunk_iter, chunker = chunk_document(file_path, max_tokens, converter, tokenizer, pipeline_options)
+
+            # Save chunks to a uniquely named file and analyze them in the same pass
+            output_path = f"outputs/{file_name}_chunks.txt"
+            analyze_and_save(chunk_iter, chunker, tokenizer, output_path)
+            error = None
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to process {Path(file_path).name}: {e}")
+            traceback.print_exc(file=sys.stdout)
+            error = str(e)
+
+    return file_path, error, report.getvalue()
+
 def main():
+    parser = argparse.ArgumentParser(description="Chunk documents with Docling's HybridChunker")
+    parser.add_argument("--with-images", action="store_true",
+                        help="Generate page/picture images at 2.0x scale (unused by chunking)")
+    parser.add_argument("--no-ocr", action="store_true",
+                        help="Skip OCR (for corpora of born-digital PDFs)")
+    parser.add_argument("--ocr-engine", choices=["easyocr", "rapidocr"], default="easyocr",
+                        help="OCR engine (rapidocr requires: pip install \"docling[rapidocr]\")")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Hybrid Chunking with Docling - Batch Processing")
     print("=" * 60)
 
+    if args.ocr_engine == "rapidocr" and not _rapidocr_available():
+        print("\n[ERROR] --ocr-engine rapidocr needs Docling's RapidOCR extra")
+        print('Install it with: pip install "docling[rapidocr]"')
+        return
+
     # Configuration
     documents_dir = "documents/knowledge"
     max_tokens = 512  # Typical limit for embedding models
@@ -175,6 +490,8 @@ def main():
         print(f"Supported formats: PDF, DOCX, PPTX, MD")
         return
 
+    all_files = largest_first(all_files)
+
     print(f"\nFound {len(all_files)} document(s) to process")
     print(f"Max tokens per chunk: {max_tokens}")
     print("\nSupported files:")
@@ -182,58 +499,50 @@ def main():
         print(f"  - {Path(file).name}")
     print()
 
-    # Initialize shared resources (prevents memory exhaustion)
-    print("\n[*] Initializing shared converter and tokenizer...")
-    print("   (Using FULL-FEATURED configuration - optimized for HPC)")
-    print("   (Table extraction, OCR, and structure preservation enabled)")
-
-    # Configure PDF pipeline with MAXIMUM quality options for HPC
-    pipeline_options = PdfPipelineOptions()
-    pipeline_options.do_table_structure = True   # Enable TableFormer for table extraction
-    pipeline_options.do_ocr = True              # Enable OCR for scanned documents
-    pipeline_options.images_scale = 2.0         # Higher resolution for better OCR (default: 1.0)
-    pipeline_options.generate_page_images = True  # Generate page images for analysis
-    pipeline_options.generate_picture_images = True  # Extract embedded images
-
-    # Create converter with FULL-FEATURED options for HPC
-    converter = DocumentConverter(
-        format_options={
-            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-        }
-    )
-
-    model_id = "sentence-transformers/all-MiniLM-L6-v2"
-    tokenizer = AutoTokenizer.from_pretrained(model_id)
-    print("[OK] Shared resources initialized")
+    # Each worker process holds its own converter and tokenizer (shared
+    # across the documents that worker handles)
+    num_workers = worker_count(len(all_files), WORKER_MEMORY_GB, PARENT_MEMORY_GB,
+                               threads_per_worker("OMP_NUM_THREADS", 4))
 
-    # Process each file
-    processed_count = 0
-    failed_count = 0
+    # Decide on the GPU here rather than in each worker: one worker per device
+    num_gpus = cuda_device_count()
+    use_cuda = num_gpus > 0
+    if use_cuda:
+        num_workers = min(num_workers, num_gpus)
 
-    for file_path in all_files:
-        file_name = Path(file_path).stem  # Get filename without extension
-        print("\n" + "=" * 60)
-        print(f"Processing: {Path(file_path).name}")
-        print("=" * 60)
-
-        try:
-            # Generate chunks (using shared converter and tokenizer)
-            chunks, chunker = chunk_document(file_path, max_tokens, converter, tokenizer)
-
-            # Analyze chunks
-            analyze_chunks(chunks, tokenizer)
-
-            # Save chunks with unique filename
-            output_path = f"outputs/{file_name}_chunks.txt"
-            save_chunks(chunks, chunker, output_path)
-
-            processed_count += 1
-
-        except Exception as e:
-            print(f"\n[ERROR] Failed to process {Path(file_path).name}: {e}")
-            failed_count += 1
-            import traceback
-            traceback.print_exc()
+    print(f"\n[*] Processing with {num_workers} worker process(es)"
+          f"{f' on {num_workers} GPU(s)' if use_cuda else ''}")
+    print("   (Using FULL-FEATURED configuration - optimized for HPC)")
+    print(f"   (Table extraction and structure preservation enabled; "
+          f"OCR {'disabled' if args.no_ocr else f'enabled ({args.ocr_engine})'}; "
+          f"page/picture images {'enabled' if args.with_images else 'disabled'})")
+
+    # Load the tokenizer once here; workers rebuild it from its serialized form
+    tokenizer = get_tokenizer()
+
+    if num_workers == 1:
+        # Single worker: run in-process and skip the pool start-up cost
+        processed_count, failed_count = print_results(
+            _process_one(file_path, max_tokens, args.with_images, not args.no_ocr, use_cuda, args.ocr_engine)
+            for file_path in all_files)
+    else:
+        context = mp_context()
+
+        # Each worker takes one device index from the queue in _init_worker
+        gpu_queue = None
+        if use_cuda:
+            gpu_queue = context.Queue()
+            for device_index in range(num_workers):
+                gpu_queue.put(device_index)
+
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(tokenizer_to_state(tokenizer), gpu_queue)) as executor:
+            # map() yields results in submission order as they complete
+            processed_count, failed_count = print_results(
+                executor.map(_process_one, all_files, repeat(max_tokens),
+                             repeat(args.with_images), repeat(not args.no_ocr),
+                             repeat(use_cuda), repeat(args.ocr_engine)))
 
     # Final summary
     print("\n" + "=" * 60)
@@ -3,7 +3,9 @@ Lightweight PDF Chunking
 =========================
 
 This script provides a memory-efficient alternative to Docling's HybridChunker
-for systems with limited RAM. It uses PyPDF2 for simple text extraction.
+for systems with limited RAM. It uses pypdfium2 (PDFium, native code) for
+simple text extraction, falling back to PyPDF2 when pypdfium2 is unavailable
+or cannot open a file.
 
 Trade-offs:
 - Lower memory usage (no ML models loaded)
@@ -21,120 +23,190 @@ Usage:
     python hybrid_chunking_lightweight.py
 """
 
+import os
+
+# Let the Rust tokenizer use its thread pool for batched calls (must be set
+# before transformers/tokenizers are imported)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
+# Size of each process's tokenizer (Rayon) thread pool; the worker count is
+# derived from the same figure so workers don't oversubscribe the CPUs
+os.environ.setdefault("RAYON_NUM_THREADS", "2")
+
 import PyPDF2
-from transformers import AutoTokenizer
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional: fall back to pure-Python PyPDF2 extraction
+    pdfium = None
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from itertools import repeat
 from pathlib import Path
-import os
+from bisect import bisect_right
+import numpy as np
 import glob
-import re
+import io
+import mmap
+import sys
+import traceback
 
+from chunking_utils import (get_tokenizer, install_tokenizer, largest_first, mp_context,
+                            print_results, threads_per_worker, tokenizer_to_state, worker_count)
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+# Approximate peak RAM of one lightweight worker (tokenizer + extracted text)
+WORKER_MEMORY_GB = 0.5
+
+# RAM kept back for the parent process (tokenizer, result bookkeeping)
+PARENT_MEMORY_GB = 0.5
+
+# Characters that end a sentence (when followed by whitespace or end of text)
+SENTENCE_TERMINATORS = np.array([ord('.'), ord('!'), ord('?')], dtype=np.uint32)
+
+# Separator line around chunk headers in output files
+CHUNK_SEPARATOR = "=" * 60 + "\n"
+
+# Write buffer for chunk output files (fewer flushes for large documents)
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Token distribution bucket edges: [0, 128), [128, 256), [256, 384), [384, 512)
+TOKEN_BUCKET_EDGES = np.array([0, 128, 256, 384, 512])
+
+# Per-process tokenizer, created lazily on first use in each worker
+
+
+def _extract_text_pdfium(pdf_path: str) -> str:
+    """Extract all text from a PDF file using pypdfium2."""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        parts = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            # PDFium ends lines with \r\n; normalize to match PyPDF2's output
+            parts.append(textpage.get_text_range().replace("\r\n", "\n"))
+            # Release native page memory as we go rather than at GC time
+            textpage.close()
+            page.close()
+        return "\n".join(parts)
+    finally:
+        pdf.close()
+
+
+def _extract_text_pypdf2(pdf_path: str) -> str:
     """Extract all text from a PDF file using PyPDF2."""
+    # PyPDF2 seeks all over the file (xref, object streams); a read-only
+    # mapping serves those seeks from the page cache without read() calls
+    with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_WILLNEED)  # Random access, so prefetch rather than MADV_SEQUENTIAL
+
+        pdf_reader = PyPDF2.PdfReader(mapped)
+        # Collect pages and join once (repeated += is quadratic on large PDFs);
+        # extract_text() can return None on some pages
+        parts = []
+        for page in pdf_reader.pages:
+            parts.append(page.extract_text() or "")
+    return "\n".join(parts)
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """Extract all text from a PDF file (pypdfium2, with PyPDF2 as fallback)."""
     try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        if pdfium is not None:
+            try:
+                return _extract_text_pdfium(pdf_path)
+            except pdfium.PdfiumError as e:
+                # e.g. encrypted/DRM files PDFium refuses to open
+                print(f"   [WARN] pypdfium2 failed ({e}), falling back to PyPDF2")
+        return _extract_text_pypdf2(pdf_path)
     except Exception as e:
         raise Exception(f"Failed to extract text from PDF: {e}")
 
 
-def split_into_sentences(text: str) -> list:
-    """Split text into sentences using simple regex."""
-    # Simple sentence splitting - can be improved with nltk.sent_tokenize
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    return [s.strip() for s in sentences if s.strip()]
-
-
 def chunk_text(text: str, tokenizer, max_tokens: int = 512) -> list:
     """
     Chunk text into segments that fit within token limits.
 
     Strategy:
-    1. Split text into sentences
-    2. Combine sentences until we approach the token limit
-    3. Create new chunk when adding next sentence would exceed limit
+    1. Tokenize the whole text once, keeping each token's character offsets
+    2. Find tokens that end a sentence (., ! or ? followed by whitespace)
+    3. Greedily take the longest run of whole sentences that fits max_tokens
+    4. If a single sentence exceeds the limit, cut it at the last whitespace
+       that fits, else between the tokenizer's pre-tokenized words (so long
+       punctuation runs can be cut), or mid-word as a last resort
+    Chunks are sliced from the original text by character offset.
     """
-    sentences = split_into_sentences(text)
+    # The whole document is longer than model_max_length by design (it is only
+    # split here), so skip transformers' "indexing errors" warning
+    encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    offsets = np.asarray(encoded['offset_mapping'], dtype=np.int64).reshape(-1, 2)
+    num_tokens = len(offsets)
+    if num_tokens == 0:
+        return []
+
+    starts, ends = offsets[:, 0], offsets[:, 1]
+
+    # Unicode code points of the text, indexable by character offset
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+    # Token positions a chunk may end before: after sentence-ending tokens...
+    candidates = np.flatnonzero(np.isin(codepoints[np.maximum(ends - 1, 0)], SENTENCE_TERMINATORS))
+    sentence_ends = [int(i) + 1 for i in candidates
+                     if ends[i] >= len(text) or text[ends[i]].isspace()]
+    # ...or, for oversized sentences, at whitespace between tokens...
+    space_ends = (np.flatnonzero(starts[1:] > ends[:-1]) + 1).tolist()
+    # ...or, failing that, between pre-tokenizer words (BERT's treats every
+    # punctuation character as a word, so runs without spaces can be cut)
+    word_ids = np.asarray(encoded.word_ids(), dtype=np.int64)
+    word_ends = (np.flatnonzero(word_ids[1:] != word_ids[:-1]) + 1).tolist()
+
     chunks = []
-    current_chunk = []
-    current_tokens = 0
-
-    for sentence in sentences:
-        sentence_tokens = len(tokenizer.encode(sentence, add_special_tokens=False))
-
-        # If single sentence exceeds max_tokens, split it into smaller pieces
-        if sentence_tokens > max_tokens:
-            # Save current chunk if it has content
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = []
-                current_tokens = 0
-
-            # Split long sentence by words
-            words = sentence.split()
-            word_chunk = []
-            word_tokens = 0
-
-            for word in words:
-                word_token_count = len(tokenizer.encode(word, add_special_tokens=False))
-                if word_tokens + word_token_count > max_tokens:
-                    if word_chunk:
-                        chunks.append(" ".join(word_chunk))
-                    word_chunk = [word]
-                    word_tokens = word_token_count
-                else:
-                    word_chunk.append(word)
-                    word_tokens += word_token_count
-
-            if word_chunk:
-                chunks.append(" ".join(word_chunk))
-            continue
-
-        # Check if adding this sentence would exceed the limit
-        if current_tokens + sentence_tokens > max_tokens:
-            # Save current chunk and start new one
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-            current_chunk = [sentence]
-            current_tokens = sentence_tokens
+    start = 0
+    while start < num_tokens:
+        limit = start + max_tokens
+        if limit >= num_tokens:
+            end = num_tokens
         else:
-            # Add sentence to current chunk
-            current_chunk.append(sentence)
-            current_tokens += sentence_tokens
-
-    # Add remaining chunk
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+            end = start
+            for boundaries in (sentence_ends, space_ends, word_ends):
+                j = bisect_right(boundaries, limit) - 1
+                if j >= 0 and boundaries[j] > start:
+                    end = boundaries[j]
+                    break
+            if end == start:
+                end = limit  # A single word longer than max_tokens
+
+        chunk = text[starts[start]:ends[end - 1]].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
 
     return chunks
 
 
-def analyze_chunks(chunks: list, tokenizer, file_name: str):
-    """Analyze and display chunk statistics."""
+def analyze_and_save(chunks: list, tokenizer, output_path: str, file_name: str):
+    """Save chunks to file and display chunk statistics in a single pass."""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
     print("\n" + "=" * 60)
     print(f"CHUNK ANALYSIS: {file_name}")
     print("=" * 60)
 
-    total_tokens = 0
-    chunk_sizes = []
+    # Count tokens of all chunks in a single batched call
+    token_counts = tokenizer(chunks, add_special_tokens=True, return_length=True)['length'] if chunks else []
+    chunk_sizes = np.fromiter(token_counts, dtype=np.int64, count=len(chunks))
 
-    for i, chunk in enumerate(chunks):
-        tokens = tokenizer.encode(chunk)
-        token_count = len(tokens)
+    with open(output_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        for i, (chunk, token_count) in enumerate(zip(chunks, chunk_sizes)):
+            f.write(f"{CHUNK_SEPARATOR}CHUNK {i}\n{CHUNK_SEPARATOR}{chunk}\n\n")
 
-        total_tokens += token_count
-        chunk_sizes.append(token_count)
+            # Display first 2 chunks in detail
+            if i < 2:
+                print(f"\n--- Chunk {i} ---")
+                print(f"Tokens: {token_count}")
+                print(f"Characters: {len(chunk)}")
+                print(f"Preview: {chunk[:150]}...")
 
-        # Display first 2 chunks in detail
-        if i < 2:
-            print(f"\n--- Chunk {i} ---")
-            print(f"Tokens: {token_count}")
-            print(f"Characters: {len(chunk)}")
-            print(f"Preview: {chunk[:150]}...")
+    total_tokens = int(chunk_sizes.sum())
 
     # Summary statistics
     print("\n" + "=" * 60)
@@ -144,29 +216,16 @@ def analyze_chunks(chunks: list, tokenizer, file_name: str):
     print(f"Total tokens: {total_tokens}")
     if len(chunks) > 0:
         print(f"Average tokens per chunk: {total_tokens / len(chunks):.1f}")
-        print(f"Min tokens: {min(chunk_sizes)}")
-        print(f"Max tokens: {max(chunk_sizes)}")
+        print(f"Min tokens: {chunk_sizes.min()}")
+        print(f"Max tokens: {chunk_sizes.max()}")
 
-        # Token distribution
+        # Token distribution (digitize keeps buckets half-open, like start <= size < end)
         print(f"\nToken distribution:")
-        ranges = [(0, 128), (128, 256), (256, 384), (384, 512)]
-        for start, end in ranges:
-            count = sum(1 for size in chunk_sizes if start <= size < end)
+        edges = TOKEN_BUCKET_EDGES
+        counts = np.bincount(np.digitize(chunk_sizes, edges), minlength=len(edges) + 1)[1:len(edges)]
+        for start, end, count in zip(edges[:-1], edges[1:], counts):
             print(f"  {start}-{end} tokens: {count} chunks")
 
-
-def save_chunks(chunks: list, output_path: str):
-    """Save chunks to file."""
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for i, chunk in enumerate(chunks):
-            f.write(f"{'='*60}\n")
-            f.write(f"CHUNK {i}\n")
-            f.write(f"{'='*60}\n")
-            f.write(chunk)
-            f.write("\n\n")
-
     print(f"\n[OK] Chunks saved to: {output_path}")
 
 
@@ -191,11 +250,76 @@ def process_document(file_path: str, tokenizer, max_tokens: int = 512):
     return chunks
 
 
+def _init_worker(tokenizer_state):
+    """Process pool initializer: install this worker's copy of the parent's tokenizer."""
+    install_tokenizer(tokenizer_state)
+
+
+def _process_one(file_path: str, max_tokens: int = 512):
+    """
+    Chunk, analyze and save a single PDF.
+
+    Runs inside a worker process, so errors are reported here and returned
+    rather than raised. The printed report is captured and returned as well,
+    so the parent can print it without concurrent workers' output
+    interleaving. Returns (file_path, error message or None, report text).
+    """
+    file_name = Path(file_path).stem
+    report = io.StringIO()
+
+    with redirect_stdout(report):
+        print("\n" + "=" * 60)
+        print(f"Processing: {Path(file_path).name}")
+        print("=" * 60)
+
+        try:
+            tokenizer = get_tokenizer()
+
+            # Process document
+            chunks = process_document(file_path, tokenizer, max_tokens)
+
+            # Save and analyze chunks
+            output_path = f"outputs/{file_name}_chunks.txt"
+            analyze_and_save(chunks, tokenizer, output_path, Path(file_path).name)
+            error = None
+
+        except Exception as e:
+            print(f"\n[ERROR] Failed to process {Path(file_path).name}: {e}")
+            traceback.print_exc(file=sys.stdout)
+            error = str(e)
+
+    return file_path, error, report.getvalue()
+
+
+def prefetch_files(paths: list):
+    """
+    Ask the kernel to start reading all input files into the page cache.
+
+    Read-ahead for every file is queued at once, keeping the storage queue
+    full while earlier documents are still being processed. No-op where
+    posix_fadvise is unavailable (e.g. Windows, macOS).
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue  # Reported properly when the file is processed
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
 def main():
     print("=" * 60)
     print("Lightweight PDF Chunking - Batch Processing")
     print("=" * 60)
-    print("NOTE: Using PyPDF2 (low memory) instead of Docling")
+    print("NOTE: Using pypdfium2/PyPDF2 (low memory) instead of Docling")
     print("      Only works with text-based PDFs (not scanned)")
     print()
 
@@ -210,6 +334,8 @@ def main():
         print(f"\n[ERROR] No PDF files found in '{documents_dir}/' folder")
         return
 
+    pdf_files = largest_first(pdf_files)
+
     print(f"Found {len(pdf_files)} PDF document(s) to process")
     print(f"Max tokens per chunk: {max_tokens}")
     print("\nFiles:")
@@ -217,40 +343,29 @@ def main():
         print(f"  - {Path(file).name}")
     print()
 
-    # Initialize tokenizer (reused across all documents)
-    print("[*] Initializing tokenizer...")
-    model_id = "sentence-transformers/all-MiniLM-L6-v2"
-    tokenizer = AutoTokenizer.from_pretrained(model_id)
-    print("[OK] Tokenizer initialized")
-
-    # Process each file
-    processed_count = 0
-    failed_count = 0
-
-    for file_path in pdf_files:
-        file_name = Path(file_path).stem
-        print("\n" + "=" * 60)
-        print(f"Processing: {Path(file_path).name}")
-        print("=" * 60)
-
-        try:
-            # Process document
-            chunks = process_document(file_path, tokenizer, max_tokens)
-
-            # Analyze chunks
-            analyze_chunks(chunks, tokenizer, Path(file_path).name)
-
-            # Save chunks
-            output_path = f"outputs/{file_name}_chunks.txt"
-            save_chunks(chunks, output_path)
-
-            processed_count += 1
-
-        except Exception as e:
-            print(f"\n[ERROR] Failed to process {Path(file_path).name}: {e}")
-            failed_count += 1
-            import traceback
-            traceback.print_exc()
+    # Each worker process gets its own tokenizer (reused across its documents).
+    # Sized before prefetching so the read-ahead does not skew the memory figure
+    num_workers = worker_count(len(pdf_files), WORKER_MEMORY_GB, PARENT_MEMORY_GB,
+                               threads_per_worker("RAYON_NUM_THREADS", 2))
+    print(f"[*] Processing with {num_workers} worker process(es)")
+
+    # Start reading every PDF from disk in the background
+    prefetch_files(pdf_files)
+
+    # Load the tokenizer once here; workers rebuild it from its serialized form
+    tokenizer = get_tokenizer()
+
+    if num_workers == 1:
+        # Single worker: run in-process and skip the pool start-up cost
+        processed_count, failed_count = print_results(
+            _process_one(file_path, max_tokens) for file_path in pdf_files)
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=mp_context(),
+                                 initializer=_init_worker,
+                                 initargs=(tokenizer_to_state(tokenizer),)) as executor:
+            # map() yields results in submission order as they complete
+            processed_count, failed_count = print_results(executor.map(_process_one, pdf_files,
+                                                                       repeat(max_tokens)))
 
     # Final summary
     print("\n" + "=" * 60)
@@ -264,7 +379,7 @@ def main():
     print("\n" + "=" * 60)
     print("ABOUT THIS LIGHTWEIGHT VERSION")
     print("=" * 60)
-    print("[+] Uses PyPDF2 (no ML models = low memory)")
+    print("[+] Uses pypdfium2/PyPDF2 (no ML models = low memory)")
     print("[+] Sentence-based chunking with token limits")
     print("[+] Works with text-based PDFs only")
     print("[-] No table extraction or OCR")